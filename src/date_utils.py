@@ -1,9 +1,12 @@
 """
 Utilities for date and time conversions used in the Euribor API.
 """
-from datetime import datetime, timezone
+from datetime import datetime
+from functools import lru_cache
 import calendar
+import time
 
+@lru_cache(maxsize=256)
 def date_to_timestamp(date_str):
     """
     Convert a date string in format YYYY-MM-DD to UTC timestamp in milliseconds
@@ -14,10 +17,10 @@ def date_to_timestamp(date_str):
     Returns:
         int: Timestamp in milliseconds
     """
-    date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-    # Force the date to be interpreted as UTC
-    date_obj = date_obj.replace(tzinfo=timezone.utc)
-    return calendar.timegm(date_obj.utctimetuple()) * 1000
+    # Fixed-width format, so slicing is enough and avoids strptime
+    year, month, day = int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10])
+    # timegm interprets the date as UTC
+    return calendar.timegm((year, month, day, 0, 0, 0)) * 1000
 
 def milliseconds_to_datetime(milliseconds):
     """
@@ -38,6 +41,22 @@ def milliseconds_to_datetime(milliseconds):
     # Format the datetime with timezone
     return dt.strftime("%Y-%m-%d %H:%M:%S %z")
 
+# Only called for the first point of each month, so a few hundred entries
+# cover every month since 1999
+@lru_cache(maxsize=512)
+def milliseconds_to_month(milliseconds):
+    """
+    Convert milliseconds to a year and month string in format YYYY-MM
+    
+    Args:
+        milliseconds (int): Timestamp in milliseconds
+        
+    Returns:
+        str: Year and month in format YYYY-MM (UTC)
+    """
+    year, month = time.gmtime(milliseconds // 1000)[:2]
+    return f"{year:04d}-{month:02d}"
+
 def extract_date(datetime_str):
     """
     Extract date part from a datetime string
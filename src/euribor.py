@@ -4,19 +4,200 @@ Fetches and processes Euribor rate data.
 """
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import json
+import math
 import calendar
 import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Optional
 
 from src.date_utils import (
     date_to_timestamp,
-    milliseconds_to_datetime,
-    extract_date,
-    extract_month
+    milliseconds_to_month
 )
 
+# Maximum number of concurrent requests sent to euribor-rates.eu
+MAX_CONCURRENT_REQUESTS = 8
+
+# Euribor rates API endpoint and the constant parts of each request
+API_URL = "https://www.euribor-rates.eu/umbraco/api/euriborpageapi/highchartsdata"
+API_PARAMS = {"series[0]": "4"}  # series[0] = 4 -> 12-months
+API_HEADERS = {
+    "Referer": "https://www.euribor-rates.eu/en/current-euribor-rates/4/euribor-rate-12-months/",
+    "Sec-Fetch-Mode": "cors",
+}
+
+# Root directory of the generated JSON files
+API_DIR = "api"
+
+# Cached API responses used for conditional requests (ETag / Last-Modified)
+HTTP_CACHE_DIR = ".http_cache"
+
+# Days after the end of a date range from which its rates are considered final.
+# A response fetched that late is reused from the cache without asking the server.
+HTTP_CACHE_SETTLE_DAYS = 7
+
+# Days after which even a settled response is revalidated with the server, so a
+# bad response that was cached does not stick forever
+HTTP_CACHE_MAX_AGE_DAYS = 30
+
+# Connect and read timeouts (in seconds) for each request
+REQUEST_TIMEOUT = (5, 30)
+
+# Shared HTTP session, so every request reuses the same keep-alive connections.
+# The pool is sized for the concurrent fetches and transient errors are retried.
+_session = requests.Session()
+_session.headers.update(API_HEADERS)
+_session.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_CONCURRENT_REQUESTS,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+# Length of a day in milliseconds, the unit of the API timestamps
+MILLISECONDS_PER_DAY = 24 * 60 * 60 * 1000
+
+# Zero-padded day keys of the JSON files ("01" to "31"), indexed by day number
+DAY_KEYS = tuple(f"{day:02d}" for day in range(32))
+
+# Maximum number of JSON files processed at the same time
+MAX_FILE_WORKERS = 8
+
+# Directories already created during this run
+_created_dirs = set()
+
+# Contents of the yearly JSON files read or written during this run, by path
+_yearly_data = {}
+
+# Yearly JSON files written sorted and formatted during this run
+_formatted_files = set()
+
+def reset_run_state():
+    """
+    Forget the directories, yearly file contents and formatted files of a previous run.
+    """
+    _created_dirs.clear()
+    _yearly_data.clear()
+    _formatted_files.clear()
+
+def ensure_dir(path):
+    """
+    Create a directory (and its parents) unless it was already created during this run.
+    
+    Args:
+        path (str): Directory path
+    """
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        # makedirs also created every parent directory
+        while path and path not in _created_dirs:
+            _created_dirs.add(path)
+            path = os.path.dirname(path)
+
+def get_cache_file(start_date, end_date):
+    """
+    Get the path of the cached API response for a date range.
+    
+    Args:
+        start_date (str): Start date in YYYY-MM-DD format
+        end_date (str): End date in YYYY-MM-DD format
+        
+    Returns:
+        str: Path of the cache file
+    """
+    # A range that does not end on the 1st is the current month up to today. It is
+    # kept in a single file per month, instead of a new file every day.
+    if not end_date.endswith("-01"):
+        end_date = "current"
+    return os.path.join(HTTP_CACHE_DIR, f"{start_date}_{end_date}.json")
+
+def is_range_settled(end_date, fetched_on):
+    """
+    Check whether the data of a date range was final when it was fetched.
+    
+    Args:
+        end_date (str): End date of the range in YYYY-MM-DD format
+        fetched_on (str): Date the data was fetched in YYYY-MM-DD format, or None
+        
+    Returns:
+        bool: True if the data was fetched at least HTTP_CACHE_SETTLE_DAYS after the range ended
+    """
+    if not fetched_on:
+        return False
+    return date_to_timestamp(end_date) + HTTP_CACHE_SETTLE_DAYS * MILLISECONDS_PER_DAY <= date_to_timestamp(fetched_on)
+
+def is_cache_expired(fetched_on, today):
+    """
+    Check whether a cached response is too old to be reused without revalidation.
+    
+    Args:
+        fetched_on (str): Date the data was fetched in YYYY-MM-DD format, or None
+        today (str): Current date in YYYY-MM-DD format
+        
+    Returns:
+        bool: True if the data was fetched at least HTTP_CACHE_MAX_AGE_DAYS before today
+    """
+    if not fetched_on:
+        return True
+    return date_to_timestamp(fetched_on) + HTTP_CACHE_MAX_AGE_DAYS * MILLISECONDS_PER_DAY <= date_to_timestamp(today)
+
+def load_cached_response(start_date, end_date):
+    """
+    Load the cached API response for a date range.
+    
+    Args:
+        start_date (str): Start date in YYYY-MM-DD format
+        end_date (str): End date in YYYY-MM-DD format
+        
+    Returns:
+        dict: Cached "etag", "last_modified" and "data", or None if not cached
+              for this exact date range
+    """
+    try:
+        with open(get_cache_file(start_date, end_date), 'rb') as f:
+            cached = json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+    
+    # Ignore cache files that are not valid entries, or that hold the current
+    # month up to an earlier day
+    if not isinstance(cached, dict) or "data" not in cached:
+        return None
+    return cached if cached.get("end_date", end_date) == end_date else None
+
+def save_cached_response(start_date, end_date, headers, data):
+    """
+    Cache an API response together with its validators. Responses are only cached
+    if the server sent validators or the date range is already settled.
+    
+    Args:
+        start_date (str): Start date in YYYY-MM-DD format
+        end_date (str): End date in YYYY-MM-DD format
+        headers (dict): Response headers
+        data (list): JSON data from the API
+    """
+    etag = headers.get("ETag")
+    last_modified = headers.get("Last-Modified")
+    fetched_on = datetime.now().strftime("%Y-%m-%d")
+    if not etag and not last_modified and not is_range_settled(end_date, fetched_on):
+        return
+    
+    # The cache is never read by people, so it is stored as compact JSON,
+    # which is faster to serialize and several times smaller
+    ensure_dir(HTTP_CACHE_DIR)
+    write_json_file(get_cache_file(start_date, end_date), {
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_on": fetched_on,
+        "end_date": end_date,
+        "data": data
+    }, indent=None)
+
 def fetch_euribor_data(start_date, end_date):
     """
     Fetch Euribor data from the API for a specific date range.
@@ -28,25 +209,46 @@ def fetch_euribor_data(start_date, end_date):
     Returns:
         list: JSON data from the API or None if request failed
     """
-    start_timestamp = date_to_timestamp(start_date)
-    end_timestamp = date_to_timestamp(end_date)
+    params = {
+        **API_PARAMS,
+        "minticks": date_to_timestamp(start_date),
+        "maxticks": date_to_timestamp(end_date),
+    }
+    
+    # Rates of a settled range don't change anymore, no need to ask the server
+    # until the cached response expires
+    cached = load_cached_response(start_date, end_date)
+    if cached:
+        fetched_on = cached.get("fetched_on")
+        today = datetime.now().strftime("%Y-%m-%d")
+        if is_range_settled(end_date, fetched_on) and not is_cache_expired(fetched_on, today):
+            return cached["data"]
+    
+    # Ask the server to skip the body if the cached response is still valid
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
     
     try:
-        response = requests.get(
-            url="https://www.euribor-rates.eu/umbraco/api/euriborpageapi/highchartsdata",
-            params={
-                "series[0]": "4", # series[0] = 4 -> 12-months
-                "minticks": start_timestamp,
-                "maxticks": end_timestamp,
-            },
-            headers={
-                "Referer": "https://www.euribor-rates.eu/en/current-euribor-rates/4/euribor-rate-12-months/",
-                "Sec-Fetch-Mode": "cors",
-            },
-        )
-                
-        if response.status_code == 200:
-            return response.json()
+        response = _session.get(url=API_URL, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        
+        if response.status_code == 304 and cached:
+            # The cached data was just confirmed, so it counts as fetched today.
+            # This lets a range cached before it settled become settled later.
+            save_cached_response(start_date, end_date, {
+                "ETag": response.headers.get("ETag") or cached.get("etag"),
+                "Last-Modified": response.headers.get("Last-Modified") or cached.get("last_modified"),
+            }, cached["data"])
+            return cached["data"]
+        elif response.status_code == 200:
+            # The API returns UTF-8 JSON, so parse the raw bytes directly and
+            # skip the text decoding and charset detection of response.json()
+            data = json.loads(response.content)
+            save_cached_response(start_date, end_date, response.headers, data)
+            return data
         else:
             print(f"HTTP request failed with status code: {response.status_code}")
             return None
@@ -54,19 +256,49 @@ def fetch_euribor_data(start_date, end_date):
     except requests.exceptions.RequestException as e:
         print(f'HTTP Request failed: {e}')
         return None
+    except ValueError as e:
+        print(f'Invalid JSON response: {e}')
+        return None
 
-def process_daily_data(year, month):
+def fetch_euribor_data_many(date_ranges, max_workers=MAX_CONCURRENT_REQUESTS):
     """
-    Process daily Euribor rates for a specific year and month.
+    Fetch Euribor data for several date ranges concurrently.
+    
+    The requests are network bound, so they are dispatched from a thread pool
+    and the total time is close to the slowest request instead of the sum of all.
+    Ranges that still fail after the HTTP retries are tried once more at the end,
+    one by one, once the other requests are no longer competing with them.
     
     Args:
-        year (int or str): The year to process
-        month (int or str): The month to process
+        date_ranges (list): List of (start_date, end_date) tuples in YYYY-MM-DD format
+        max_workers (int): Maximum number of requests in flight at the same time
         
     Returns:
-        dict: Statistics about the processing and daily data organized by year/month
+        list: JSON data (or None) for each date range, in the same order
+    """
+    if not date_ranges:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(date_ranges))) as executor:
+        results = list(executor.map(lambda date_range: fetch_euribor_data(*date_range), date_ranges))
+    
+    for index, date_range in enumerate(date_ranges):
+        if results[index] is None:
+            results[index] = fetch_euribor_data(*date_range)
+    
+    return results
+
+def get_month_date_range(year, month):
+    """
+    Calculate the date range to request for a specific year and month.
+    
+    Args:
+        year (int or str): The year
+        month (int or str): The month
+        
+    Returns:
+        tuple: (min_date, max_date) in YYYY-MM-DD format
     """
-    # Calculate date range
     year_str = str(year)
     month_str = f"{int(month):02d}"
     
@@ -91,8 +323,28 @@ def process_daily_data(year, month):
     if int(year_str) == now.year and int(month_str) == now.month:
         max_date = now.strftime("%Y-%m-%d")
     
+    return min_date, max_date
+
+def process_daily_data(year, month, data=None):
+    """
+    Process daily Euribor rates for a specific year and month.
+    
+    Args:
+        year (int or str): The year to process
+        month (int or str): The month to process
+        data (list, optional): Already fetched JSON data covering the month (it may
+                               span a longer range). If None, it is fetched from the API.
+        
+    Returns:
+        dict: Statistics about the processing and daily data organized by year/month
+    """
+    # Bounds of the month in milliseconds, so each point is placed with integer
+    # arithmetic instead of converting its timestamp to a date string
+    month_start, month_end = get_month_bounds(int(year), int(month))
+    
     # Fetch data
-    data = fetch_euribor_data(min_date, max_date)
+    if data is None:
+        data = fetch_euribor_data(*get_month_date_range(year, month))
     
     if not data:
         return {"days_processed": 0, "daily_data": {}}
@@ -101,30 +353,125 @@ def process_daily_data(year, month):
     # Track daily data for this month to generate monthly JSON files
     daily_data = {}
         
-    for series in data:
-        for point in series['Data']:
-            timestamp, value = point
-            date_str = milliseconds_to_datetime(timestamp)
-
-            # Extract date from datetime string (YYYY-MM-DD)
-            date = extract_date(date_str)
-            
-            # Parse date components
-            date_year, date_month, day = date.split('-')
-            
-            # Only include data for the requested year and month
-            if date_year == year_str and date_month == month_str:
-                daily_data[day] = value
-                days_processed += 1
+    for timestamp, value in iter_points(data):
+        # Only include data for the requested year and month
+        if month_start <= timestamp < month_end:
+            day = (timestamp - month_start) // MILLISECONDS_PER_DAY + 1
+            daily_data[DAY_KEYS[day]] = value
+            days_processed += 1
     
     return {"days_processed": days_processed, "daily_data": daily_data}
 
-def process_monthly_data(data):
+def iter_points(data):
+    """
+    Iterate over the [timestamp, value] points of all the series in the API data.
+    
+    Args:
+        data (list): JSON data from the API
+        
+    Returns:
+        iterator: The points of every series, one after the other
+    """
+    return chain.from_iterable(series['Data'] for series in data)
+
+def get_month_bounds(year, month):
+    """
+    Calculate the timestamps where a month starts and ends.
+    
+    Args:
+        year (int): The year
+        month (int): The month
+        
+    Returns:
+        tuple: (start, end) in milliseconds, end being the start of the next month
+    """
+    month_start = date_to_timestamp(f"{year}-{month:02d}-01")
+    return month_start, month_start + calendar.monthrange(year, month)[1] * MILLISECONDS_PER_DAY
+
+def group_points_by_month(data):
+    """
+    Group the API data points by month with a single pass over the points.
+    
+    The points come sorted by time, so the month of a point is only worked
+    out when it falls outside the bounds of the previous point's month.
+    
+    Args:
+        data (list): JSON data from the API
+        
+    Returns:
+        dict: List of [timestamp, value] points keyed by month (YYYY-MM)
+    """
+    points_by_month = {}
+    month_start = month_end = 0
+    points = None
+    
+    for point in iter_points(data):
+        if not month_start <= point[0] < month_end:
+            month_key = milliseconds_to_month(point[0])
+            month_start, month_end = get_month_bounds(int(month_key[:4]), int(month_key[5:7]))
+            points = points_by_month.setdefault(month_key, [])
+        points.append(point)
+    
+    return points_by_month
+
+def split_data_by_month(data):
+    """
+    Split API data into one payload per month with a single pass over the points.
+    
+    Args:
+        data (list): JSON data from the API
+        
+    Returns:
+        dict: API-shaped data (a list with one series) keyed by month (YYYY-MM)
+    """
+    return {month_key: [{"Data": points}] for month_key, points in group_points_by_month(data).items()}
+
+def select_months_data(year, months, data):
+    """
+    Pick the data of several months out of the data of their whole year.
+    
+    Args:
+        year (int): The year
+        months (list): The months to pick (1-12)
+        data (list): JSON data from the API for the year, or None if the request failed
+        
+    Returns:
+        list: API-shaped data for each month. If the yearly data is missing every
+              month gets None instead, so that it is fetched on its own.
+    """
+    if data is None:
+        return [None] * len(months)
+    
+    # Group the year's points by month once, so each month only walks its own points
+    data_by_month = split_data_by_month(data)
+    return [data_by_month.get(f"{year}-{month:02d}", []) for month in months]
+
+def calculate_monthly_averages(data):
+    """
+    Calculate the average Euribor rate of each month in the data.
+    
+    Args:
+        data (list): JSON data from the API
+        
+    Returns:
+        dict: Average rate rounded to 3 decimals, keyed by month (YYYY-MM)
+    """
+    # math.fsum sums the values in C without accumulating rounding errors, which
+    # could otherwise move an average that ends in 5 to the wrong side when rounded
+    averages = {}
+    for month_key, points in group_points_by_month(data).items():
+        values = [value for _, value in points]
+        averages[month_key] = round(math.fsum(values) / len(values), 3)
+    
+    return averages
+
+def process_monthly_data(data, now=None):
     """
     Process and calculate monthly average Euribor rates.
     
     Args:
         data (list): JSON data from the API
+        now (datetime, optional): Time of the run, used as last_modified. Defaults to now.
         
     Returns:
         dict: Statistics about the processing and monthly averages
@@ -132,47 +479,107 @@ def process_monthly_data(data):
     if not data:
         return {"months_processed": 0, "monthly_averages": {}}
         
-    # Initialize dictionary to store monthly averages
-    monthly_averages = {}
-    months_processed = 0
-
-    for series in data:
-        for point in series['Data']:
-            timestamp, value = point
-            date_str = milliseconds_to_datetime(timestamp)
-
-            # Extract date from datetime string (YYYY-MM-DD)
-            date = extract_date(date_str)
-            
-            # Extract year and month from date
-            year_month = extract_month(date)
-            
-            # Initialize list for this month if not exists
-            if year_month not in monthly_averages:
-                monthly_averages[year_month] = []
-            
-            # Add value to the month's list
-            monthly_averages[year_month].append(value)
-            
-    # Calculate average for each month
-    monthly_average_values = {}
-    for month_key, values in monthly_averages.items():
-        average = sum(values) / len(values)
-        average = round(average, 3)
-        monthly_average_values[month_key] = average
-        months_processed += 1
-    
-    # Process monthly averages for JSON files
+    monthly_average_values = calculate_monthly_averages(data)
+    months_processed = len(monthly_average_values)
+    
+    # Group the monthly averages by year, so each year's JSON file
+    # is read and written once instead of once per month
+    averages_by_year = {}
     for month_key, average in monthly_average_values.items():
         # Extract year and month from the key (YYYY-MM format)
-        year, month = month_key.split('-')
-        
-        # Update or create the year's JSON file
-        update_yearly_json(year, month, average)
+        year, month = month_key[:4], month_key[5:7]
+        averages_by_year.setdefault(year, {})[month] = average
+    
+    # Update or create each year's JSON file, sharing a single timestamp
+    now_str = (now or datetime.now()).strftime("%Y-%m-%dT%H:%M:%S")
+    months_updated = 0
+    for year, averages in averages_by_year.items():
+        months_updated += update_yearly_months(year, averages, now_str)
+    
+    # Report once instead of printing for every month
+    if months_updated:
+        print(f"Added or updated {months_updated} monthly averages")
     
     return {"months_processed": months_processed, "monthly_averages": monthly_average_values}
 
-def update_yearly_json(year, month, value):
+def read_json_file(path):
+    """
+    Read a JSON file.
+    
+    Args:
+        path (str): Path of the JSON file
+        
+    Returns:
+        dict: Parsed data, or an empty dict if the file does not exist or is not a valid JSON object
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = json.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        # ValueError covers both invalid JSON and invalid UTF-8
+        return {}
+    
+    return data if isinstance(data, dict) else {}
+
+def read_yearly_data(path):
+    """
+    Read a yearly JSON file, reusing the contents kept from an earlier
+    read or write during this run instead of parsing the file again.
+    
+    Args:
+        path (str): Path of the yearly JSON file
+        
+    Returns:
+        dict: A copy of the yearly data that can be modified by the caller
+    """
+    data = _yearly_data.get(path)
+    if data is None:
+        data = _yearly_data[path] = read_json_file(path)
+    return dict(data)
+
+def write_json_file(path, data, indent=2):
+    """
+    Write data to a JSON file unless it already has the same content.
+    
+    Args:
+        path (str): Path of the JSON file
+        data (dict): Data to write
+        indent (int, optional): Indentation level, or None for compact JSON
+        
+    Returns:
+        bool: True if the file was written, False if it was already up to date
+    """
+    payload = json.dumps(data, indent=indent).encode("utf-8")
+    
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == payload:
+                return False
+    except FileNotFoundError:
+        pass
+    
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return True
+
+def get_yearly_json_file(year):
+    """
+    Get the path of the JSON file with the monthly averages of a year,
+    creating its directory if needed.
+    
+    Args:
+        year (int or str): The year
+        
+    Returns:
+        str: Path of the yearly JSON file
+    """
+    api_dir = os.path.join(API_DIR, str(year))
+    ensure_dir(api_dir)
+    return os.path.join(api_dir, "index.json")
+
+def update_yearly_json(year, month, value, now_str=None):
     """
     Generate or update JSON file with monthly averages for a specific year.
     
@@ -180,201 +587,234 @@ def update_yearly_json(year, month, value):
         year (str): The year
         month (str): The month (01-12)
         value (float): The average Euribor rate for the month
+        now_str (str, optional): last_modified timestamp if the month changes
+                                 (YYYY-MM-DDTHH:MM:SS). Defaults to now.
+        
+    Returns:
+        bool: True if the month was added or its value changed
     """
-    # Create directory if not exists
-    api_dir = os.path.join("api", year)
-    os.makedirs(api_dir, exist_ok=True)
-    
-    # JSON file path
-    json_file = os.path.join(api_dir, "index.json")
+    return update_yearly_months(year, {month: value}, now_str) > 0
+
+def update_yearly_months(year, monthly_values, now_str=None):
+    """
+    Generate or update JSON file with the monthly averages of several months of a year.
+    The file is read and written at most once, whatever the number of months.
     
-    # Initialize data structure
-    data = {}
+    Args:
+        year (str): The year
+        monthly_values (dict): The average Euribor rate keyed by month (01-12)
+        now_str (str, optional): last_modified timestamp for changed months
+                                 (YYYY-MM-DDTHH:MM:SS). Defaults to now.
+        
+    Returns:
+        int: Number of months that were added or whose value changed
+    """
+    json_file = get_yearly_json_file(year)
     
     # Read existing file if it exists
-    if os.path.exists(json_file):
-        try:
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-        except json.JSONDecodeError:
-            # If file exists but is not valid JSON, initialize as empty
-            data = {}
-    
-    # Check if we need to update the last_modified date
-    # Only update if the month doesn't exist or if the value has changed
-    should_update_date = False
-    is_new_data = False
-    
-    if month not in data:
-        should_update_date = True
-        is_new_data = True
-    elif data[month]["value"] != str(value):
-        should_update_date = True
+    data = read_yearly_data(json_file)
     
     # Current datetime in ISO format for last_modified
-    current_datetime = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-    
-    # If entry exists and we don't need to update the date, keep the old last_modified
-    last_modified = current_datetime
-    if month in data and not should_update_date and "_meta" in data[month] and "last_modified" in data[month]["_meta"]:
-        last_modified = data[month]["_meta"]["last_modified"]
-    
-    # Update data for this month
-    data[month] = {
-        "value": str(value),
-        "_meta": {
-            "full_date": f"{year}-{month}",
-            "last_modified": last_modified
-        }
-    }
+    if now_str is None:
+        now_str = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
     
-    # Sort the data by month number before writing to file
-    # Create a new ordered dictionary
-    ordered_data = {}
+    months_updated = 0
+    file_changed = False
     
-    # Get all months and sort them numerically
-    months = sorted(data.keys(), key=int)
+    for month, value in monthly_values.items():
+        existing = data.get(month)
+        value_str = str(value)
+        
+        # Only update the last_modified date if the month doesn't exist or its value
+        # has changed, otherwise keep the old one (if there is one)
+        should_update_date = existing is None or existing["value"] != value_str
+        last_modified = None if should_update_date else existing.get("_meta", {}).get("last_modified")
+        
+        # Update data for this month
+        entry = {
+            "value": value_str,
+            "_meta": {
+                "full_date": f"{year}-{month}",
+                "last_modified": last_modified or now_str
+            }
+        }
+        
+        # The month is already up to date
+        if existing == entry:
+            continue
+        
+        data[month] = entry
+        file_changed = True
+        if should_update_date:
+            months_updated += 1
     
-    # Add each month to the ordered dictionary
-    for m in months:
-        ordered_data[m] = data[m]
+    # The file is already up to date, skip writing it
+    if not file_changed:
+        return 0
+    
+    # Sort the data by month number before writing to file. json.dumps(sort_keys=True)
+    # can't be used instead, it would also reorder the "value" and "_meta" keys.
+    ordered_data = {m: data[m] for m in sorted(data.keys(), key=int)}
     
     # Write ordered data to JSON file
-    with open(json_file, 'w') as f:
-        json.dump(ordered_data, f, indent=2)
+    write_json_file(json_file, ordered_data)
+    _yearly_data[json_file] = ordered_data
+    _formatted_files.add(json_file)
     
-    # Only print message if the data was actually updated or added
-    if is_new_data:
-        print(f'Added new data for {year}-{month} to {json_file}')
-    elif should_update_date:
-        print(f'Updated value for {year}-{month} in {json_file}')
+    return months_updated
 
-def generate_monthly_json(year: str, month: str, daily_data: dict) -> None:
+def generate_monthly_json(year: str, month: str, daily_data: dict, now: Optional[datetime] = None) -> Optional[str]:
     """
     Generate or update a JSON file with all daily data for a specific month.
     The JSON structure contains daily rates with value and metadata.
     Days without data (weekends, holidays) are included with a null value.
     Days in the future (after current date) are not included.
+    The current date and last_modified come from now, which defaults to the
+    time of the call.
+    
+    Returns "Created" or "Updated" if the file was written, None if it was
+    already up to date. Nothing is printed, so callers running several months
+    at once can report them together.
     """
     # Create directory if not exists
-    os.makedirs(os.path.join("api", year, month), exist_ok=True)
+    month_dir = os.path.join(API_DIR, year, month)
+    ensure_dir(month_dir)
     
     # Define the output file
-    output_file = os.path.join("api", year, month, "index.json")
+    output_file = os.path.join(month_dir, "index.json")
     
     # Prepare new data
-    current_data = {}
-    if os.path.exists(output_file):
-        try:
-            with open(output_file, "r") as f:
-                current_data = json.load(f)
-        except json.JSONDecodeError:
-            current_data = {}
+    current_data = read_json_file(output_file)
+    # Whether the month already had data, known without another stat call
+    existed = bool(current_data)
     
     updated = False
-    now = datetime.now()
-    now_str = now.strftime("%Y-%m-%dT%H:%M:%S")
-    
-    # Get current date for comparison with future dates
-    current_year = now.year
-    current_month = now.month
-    current_day = now.day
+    if now is None:
+        now = datetime.now()
+    # Formatted on the first changed day, most months have none
+    now_str = None
     
     # Determine the number of days in this month
     year_int = int(year)
     month_int = int(month)
     _, num_days = calendar.monthrange(year_int, month_int)
     
-    # Process all days in the month
-    for day_int in range(1, num_days + 1):
-        # Skip future dates
-        if (year_int > current_year or 
-            (year_int == current_year and month_int > current_month) or
-            (year_int == current_year and month_int == current_month and day_int > current_day)):
-            # Remove future dates if they exist in the current data
-            day = f"{day_int:02d}"
-            if day in current_data:
-                updated = True
-                current_data.pop(day)
-            continue
-            
-        day = f"{day_int:02d}"  # Format day as "01", "02", etc.
-        
-        # If we have data for this day, use it
-        if day in daily_data:
-            value = daily_data[day]
-            value_str = str(value)
-            
-            # Only update if the value is different or the day doesn't exist yet
-            if day not in current_data or current_data[day]["value"] != value_str:
-                updated = True
-                current_data[day] = {
-                    "value": value_str,
-                    "_meta": {
-                        "full_date": f"{year}-{month}-{day}",
-                        "last_modified": now_str
-                    }
-                }
-        else:
-            # For days without data, add them with null value if they don't exist
-            # or if they exist but have a non-null value
-            if day not in current_data or current_data[day]["value"] is not None:
-                updated = True
-                current_data[day] = {
-                    "value": None,
-                    "_meta": {
-                        "full_date": f"{year}-{month}-{day}",
-                        "last_modified": now_str
-                    }
+    # Last day that is not in the future (0 if the whole month is in the future)
+    if (year_int, month_int) < (now.year, now.month):
+        last_day = num_days
+    elif (year_int, month_int) == (now.year, now.month):
+        last_day = now.day
+    else:
+        last_day = 0
+    
+    # Convert all the values to strings in a single pass
+    value_strs = {day: str(value) for day, value in daily_data.items()}
+    
+    # Prefix of the full date of every day in the month
+    date_prefix = f"{year}-{month}-"
+    
+    # Process all days in the month up to today
+    for day in DAY_KEYS[1:last_day + 1]:
+        # Days without data (weekends, holidays) get a null value
+        value_str = value_strs.get(day)
+        
+        # Only update if the value is different or the day doesn't exist yet
+        if day not in current_data or current_data[day]["value"] != value_str:
+            updated = True
+            if now_str is None:
+                now_str = now.strftime("%Y-%m-%dT%H:%M:%S")
+            current_data[day] = {
+                "value": value_str,
+                "_meta": {
+                    "full_date": date_prefix + day,
+                    "last_modified": now_str
                 }
+            }
+    
+    # Remove future dates if they exist in the current data
+    for day in DAY_KEYS[last_day + 1:num_days + 1]:
+        if current_data.pop(day, None) is not None:
+            updated = True
     
     # Write the updated data if needed
     if updated:
         # Sort the days numerically
         ordered_data = {k: current_data[k] for k in sorted(current_data.keys(), key=int)}
         
-        with open(output_file, "w") as f:
-            json.dump(ordered_data, f, indent=2)
-            
-        # Print a message only if we've actually updated something
-        print(f"Updated daily JSON data for {year}/{month}")
+        write_json_file(output_file, ordered_data)
+        return "Updated" if existed else "Created"
+    
+    return None
+
+def print_daily_json_changes(year, months, results):
+    """
+    Print one line per kind of change for the daily JSON files of a year,
+    instead of one line for every month written.
+    
+    Args:
+        year (int): The year
+        months (list): The months processed
+        results (list): Result of send_request_per_day for each month
+    """
+    changes = {}
+    for month, result in zip(months, results):
+        status = result.get("json_status")
+        if status:
+            changes.setdefault(status, []).append(f"{year}/{month:02d}")
+    
+    for status, labels in changes.items():
+        print(f"{status} daily JSON data for {', '.join(labels)}")
 
-def send_request_per_day(year=2025, month=4):
+def send_request_per_day(year=2025, month=4, data=None, now=None):
     """
     Fetch daily Euribor rates and generate JSON files.
     
     Args:
         year (int): The year to fetch data for
         month (int): The month to fetch data for
+        data (list, optional): Already fetched JSON data covering the month
+        now (datetime, optional): Time of the run. Defaults to now.
         
     Returns:
         dict: Statistics about the processing
     """
-    result = process_daily_data(year, month)
+    result = process_daily_data(year, month, data)
     
     # Generate the monthly JSON file if we have daily data
+    result["json_status"] = None
     if result["days_processed"] > 0:
-        generate_monthly_json(str(year), f"{month:02d}", result["daily_data"])
+        result["json_status"] = generate_monthly_json(str(year), f"{month:02d}", result["daily_data"], now)
     
     return result
 
-def send_request_per_month(year=2025):
+def get_year_date_range(year):
+    """
+    Calculate the date range to request for a specific year.
+    
+    Args:
+        year (int): The year
+        
+    Returns:
+        tuple: (min_date, max_date) in YYYY-MM-DD format
+    """
+    return f"{year}-01-01", f"{year+1}-01-01"
+
+def send_request_per_month(year=2025, data=None, now=None):
     """
     Fetch Euribor rates for a specific year and calculate monthly averages.
     
     Args:
         year (int): The year to fetch data for
+        data (list, optional): Already fetched JSON data for the year
+        now (datetime, optional): Time of the run. Defaults to now.
         
     Returns:
         dict: Statistics about the processing
     """
-    # Calculate date range for the year
-    min_date = f"{year}-01-01"
-    max_date = f"{year+1}-01-01"
-    
     # Fetch and process data
-    data = fetch_euribor_data(min_date, max_date)
-    return process_monthly_data(data)
+    if data is None:
+        data = fetch_euribor_data(*get_year_date_range(year))
+    return process_monthly_data(data, now)
 
 def generate_all_yearly_json(years=None):
     """
@@ -390,37 +830,87 @@ def generate_all_yearly_json(years=None):
     if years is None:
         years = list(range(1999, current_year + 1))
     
-    # Create sorted JSON files for each year
-    for year in years:
-        create_yearly_json(str(year))
-    
+    # Create sorted JSON files for each year, each year is an independent
+    # file so they can be read and written concurrently
     if years:
+        with ThreadPoolExecutor(max_workers=min(MAX_FILE_WORKERS, len(years))) as executor:
+            list(executor.map(create_yearly_json, [str(year) for year in years]))
         print(f"Ensured all yearly JSON files are properly formatted for {len(years)} years")
     else:
         print("No yearly JSON files to process")
 
-def generate_all_monthly_json(months_to_process=None):
+def generate_daily_json(months_to_process, yearly_data, now=None):
+    """
+    Generate the daily JSON files of the selected months from their yearly data.
+    
+    Args:
+        months_to_process (dict): Dictionary mapping year -> list of months to process
+        yearly_data (dict): Dictionary mapping year -> JSON data fetched for the year.
+                            Months of a year whose data is None are fetched on their own.
+        now (datetime, optional): Time of the run. Defaults to now.
+        
+    Returns:
+        list: (year, month, result of send_request_per_day) for each month processed
+    """
+    # A single time for every file, so they all get the same last_modified
+    if now is None:
+        now = datetime.now()
+    
+    years = sorted(yearly_data.keys())
+    tasks = []
+    monthly_data = []
+    for year in years:
+        months = sorted(months_to_process[year])
+        print(f"Processing {', '.join(f'{year}/{month:02d}' for month in months)}...")
+        tasks.extend((year, month) for month in months)
+        monthly_data.extend(select_months_data(year, months, yearly_data[year]))
+    
+    # Each month is written to its own file, so they are generated concurrently
+    results = []
+    if tasks:
+        with ThreadPoolExecutor(max_workers=min(MAX_FILE_WORKERS, len(tasks))) as executor:
+            task_years = [year for year, _ in tasks]
+            task_months = [month for _, month in tasks]
+            results = list(executor.map(send_request_per_day, task_years, task_months, monthly_data, [now] * len(tasks)))
+    
+    # The results are in task order, so the months of each year are consecutive
+    # and their changes are reported together
+    offset = 0
+    for year in years:
+        months = sorted(months_to_process[year])
+        print_daily_json_changes(year, months, results[offset:offset + len(months)])
+        offset += len(months)
+    
+    return [(year, month, result) for (year, month), result in zip(tasks, results)]
+
+def generate_all_monthly_json(months_to_process=None, now=None):
     """
     Generate JSON files with daily data for specified years and months by fetching and processing data.
     
     Args:
         months_to_process (dict, optional): Dictionary mapping year -> list of months to process.
                                            If None, defaults to current year/month.
+        now (datetime, optional): Time of the run. Defaults to now.
     """
+    if now is None:
+        now = datetime.now()
     if months_to_process is None:
-        today = datetime.now()
-        months_to_process = {today.year: [today.month]}
+        months_to_process = {now.year: [now.month]}
     
     # Track statistics for reporting
     total_months = 0
     total_days = 0
     
-    for year, months in months_to_process.items():
-        for month in months:
-            result = send_request_per_day(year, month)
-            if result["days_processed"] > 0:
-                total_months += 1
-                total_days += result["days_processed"]
+    # Fetch each year once (concurrently) and split it into its months, instead
+    # of sending one request per month. The same yearly ranges are requested
+    # by main, so they also share its conditional request cache.
+    years = sorted(months_to_process.keys())
+    yearly_data = dict(zip(years, fetch_euribor_data_many([get_year_date_range(year) for year in years])))
+    
+    for _, _, result in generate_daily_json(months_to_process, yearly_data, now):
+        if result["days_processed"] > 0:
+            total_months += 1
+            total_days += result["days_processed"]
     
     # Report statistics if any data was found
     if total_months > 0:
@@ -486,66 +976,71 @@ def create_yearly_json(year):
     Args:
         year (int or str): The year to process
     """
-    # Convert year to string if it's an integer
-    year_str = str(year)
-    
-    # Create directory if not exists
-    api_dir = os.path.join("api", year_str)
-    os.makedirs(api_dir, exist_ok=True)
-    
-    # JSON file path
-    json_file = os.path.join(api_dir, "index.json")
+    json_file = get_yearly_json_file(year)
     
     # Read existing file if it exists
-    data = {}
-    if os.path.exists(json_file):
-        try:
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-        except json.JSONDecodeError:
-            data = {}
+    data = read_yearly_data(json_file)
+    
+    # Already written sorted during this run, nothing to check again
+    if json_file in _formatted_files:
+        return data
     
     # Sort the data by month number
-    ordered_data = {}
-    months = sorted(data.keys(), key=int)
-    for m in months:
-        ordered_data[m] = data[m]
+    ordered_data = {m: data[m] for m in sorted(data.keys(), key=int)}
     
     # Write ordered data to JSON file
-    with open(json_file, 'w') as f:
-        json.dump(ordered_data, f, indent=2)
+    write_json_file(json_file, ordered_data)
+    _yearly_data[json_file] = ordered_data
+    _formatted_files.add(json_file)
     
     return data
 
-# Only run this if the script is executed directly
-if __name__ == "__main__":
+def main():
+    """
+    Command line entry point: fetch, process and write the selected years and months.
+    """
     args, months_to_process = parse_args()
+    reset_run_state()
+    
+    # A single time for the whole run, so every file changed in it gets the same last_modified
+    now = datetime.now()
     
-    # Process data for each selected year and month
+    # Fetch every selected year concurrently before processing. A single request
+    # per year feeds both the monthly averages and the daily files of its months.
     years = sorted(months_to_process.keys())
-    for year in years:
-        specific_months = sorted(months_to_process[year])
-        
-        # Process monthly data for the year
+    month_keys = [(year, month) for year in years for month in sorted(months_to_process[year])]
+    yearly_data = dict(zip(years, fetch_euribor_data_many([get_year_date_range(year) for year in years])))
+    
+    # Years that could not be fetched even after retrying are reported at the end,
+    # instead of silently leaving their files out of date
+    failed_years = [year for year in years if yearly_data[year] is None]
+    
+    # Process the monthly averages of each year that could be fetched
+    fetched_data = {year: yearly_data[year] for year in years if yearly_data[year] is not None}
+    for year, data in fetched_data.items():
         print(f"Updating monthly data for {year}...")
-        monthly_result = send_request_per_month(year)
-        
-        # Process daily data for the specific months of this year
-        for month in specific_months:
-            print(f"Processing {year}/{month:02d}...")
-            daily_result = send_request_per_day(year, month)
-        
-        # Create yearly JSON file (with monthly averages)
-        create_yearly_json(year)
-                
+        send_request_per_month(year, data, now)
+    
+    # Process the daily data of their selected months
+    generate_daily_json(months_to_process, fetched_data, now)
+    
     # Print summary
     total_years = len(years)
-    total_months = sum(len(months) for months in months_to_process.values())
+    total_months = len(month_keys)
     print(f"JSON files processed for {total_years} years (from {min(years) if years else 'none'} to {max(years) if years else 'none'}).")
     print(f"Processed {total_months} months of data.")
     
-    # Generate all required JSON files
-    generate_all_yearly_json(years)
-    generate_all_monthly_json(months_to_process)
+    # Make sure the yearly JSON files (with monthly averages) are sorted.
+    # The monthly JSON files were already generated above, so they are not fetched again.
+    # Years that failed are left untouched.
+    generate_all_yearly_json([year for year in years if year not in failed_years])
+    
+    if failed_years:
+        print(f"Could not fetch data for {', '.join(str(year) for year in failed_years)}.")
+        sys.exit(1)
     
     print(f"Process completed.")
+
+# Only run this if the script is executed directly
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,13 @@ import pytest
 from unittest import mock
 import os
 import json
-from datetime import datetime, timezone
-import calendar
-import sys
-
-# Add parent directory to path to be able to import modules correctly
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import threading
+from datetime import datetime
+from types import SimpleNamespace
 
 # Import the modules to test
 import src.date_utils as date_utils
+import src.euribor as euribor
 from src.euribor import (
     send_request_per_day, 
     send_request_per_month, 
@@ -18,9 +16,16 @@ from src.euribor import (
     generate_monthly_json,
     generate_all_yearly_json,
     generate_all_monthly_json,
-    create_yearly_json
+    create_yearly_json,
+    fetch_euribor_data_many
 )
 
+# Paths written by the code under test, relative to the working directory
+YEAR_2021_DIR = os.path.join('api', '2021')
+JANUARY_2021_DIR = os.path.join(YEAR_2021_DIR, '01')
+YEAR_2021_JSON = os.path.join(YEAR_2021_DIR, 'index.json')
+JANUARY_2021_JSON = os.path.join(JANUARY_2021_DIR, 'index.json')
+
 # Sample test data
 SAMPLE_API_RESPONSE = [
     {
@@ -33,66 +38,126 @@ SAMPLE_API_RESPONSE = [
     }
 ]
 
-MOCK_RESPONSE = mock.Mock()
-MOCK_RESPONSE.status_code = 200
-MOCK_RESPONSE.json.return_value = SAMPLE_API_RESPONSE
+
+# Run times shared by several tests
+END_OF_2021 = datetime(2021, 12, 31, 12, 0, 0)
+AFTER_JANUARY_2021 = datetime(2021, 2, 1, 12, 0, 0)
+
+# Monthly JSON file expected for the sample January 2021 data when generated at AFTER_JANUARY_2021
+JANUARY_DAYS = tuple(f"{day:02d}" for day in range(1, 32))
+EXPECTED_JANUARY_2021 = {
+    day: {
+        "value": None,
+        "_meta": {"full_date": f"2021-01-{day}", "last_modified": "2021-02-01T12:00:00"}
+    }
+    for day in JANUARY_DAYS
+}
+EXPECTED_JANUARY_2021["01"]["value"] = "0.123"
+EXPECTED_JANUARY_2021["02"]["value"] = "0.145"
+EXPECTED_JANUARY_2021["03"]["value"] = "0.167"
+EXPECTED_JANUARY_2021["04"]["value"] = "0.189"
+
+
+def frozen_datetime(frozen):
+    """Build a datetime class whose now() returns its frozen attribute"""
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.frozen
+    
+    FrozenDatetime.frozen = frozen
+    return FrozenDatetime
+
+
+def load_json(path):
+    """Read and parse a JSON file written by the code under test"""
+    try:
+        with open(path, 'rb') as f:
+            return json.loads(f.read())
+    except FileNotFoundError:
+        pytest.fail(f"{path} was not written")
 
 
 class TestEuriborFunctions:
     """Unit tests for individual functions in euribor.py"""
 
-    def test_date_to_timestamp(self):
-        """Test conversion from date string to timestamp in milliseconds"""
-        # Test a known date
-        timestamp = date_utils.date_to_timestamp("2021-01-01")
-        expected = 1609459200000  # 2021-01-01 00:00:00 UTC in milliseconds
-        assert timestamp == expected
+    @pytest.mark.parametrize("func, arg, expected", [
+        # 2021-01-01 00:00:00 UTC in milliseconds
+        (date_utils.date_to_timestamp, "2021-01-01", 1609459200000),
+        (date_utils.milliseconds_to_month, 1609459200000, "2021-01"),
+        (date_utils.extract_date, "2021-01-01 12:00:00 +0000", "2021-01-01"),
+        (date_utils.extract_month, "2021-01-15", "2021-01"),
+    ])
+    def test_date_conversion(self, func, arg, expected):
+        """Test the date conversion helpers against known values"""
+        assert func(arg) == expected
 
     def test_milliseconds_to_datetime(self):
         """Test conversion from milliseconds to datetime string"""
         date_str = date_utils.milliseconds_to_datetime(1609459200000)
         assert "2021-01-01" in date_str
 
-    def test_extract_date(self):
-        """Test extracting date from datetime string"""
-        date = date_utils.extract_date("2021-01-01 12:00:00 +0000")
-        assert date == "2021-01-01"
+    @pytest.mark.parametrize("func, arg", [
+        (date_utils.date_to_timestamp, "2021-01-01"),
+        (date_utils.milliseconds_to_month, 1609459200000),
+    ])
+    def test_timestamp_conversions_are_cached(self, func, arg):
+        """Test that repeated conversions are served from the cache"""
+        func.cache_clear()
+        assert func(arg) == func(arg)
+        assert func.cache_info().hits == 1
 
-    def test_extract_month(self):
-        """Test extracting month from date string"""
-        month = date_utils.extract_month("2021-01-15")
-        assert month == "2021-01"
 
+@pytest.fixture(autouse=True)
+def reset_run_state():
+    """Forget the directories, yearly file contents and formatted files of previous tests"""
+    euribor.reset_run_state()
 
-@pytest.fixture
-def mock_requests_get(monkeypatch):
-    """Mock the requests.get function for testing"""
+
+@pytest.fixture(autouse=True)
+def isolated_workdir(tmp_path, monkeypatch):
+    """Run each test from its own directory so api/ and the HTTP cache are never touched"""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope="session")
+def mock_response():
+    """Successful API response with the sample data, built once per session"""
+    # A plain namespace, so attribute reads don't go through Mock's machinery
+    return SimpleNamespace(
+        status_code=200,
+        content=json.dumps(SAMPLE_API_RESPONSE).encode(),
+        headers={},
+    )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def mock_requests_get(mock_response):
+    """Mock the requests.Session.get method once for the whole session, so no test reaches the network"""
     def mock_get(*args, **kwargs):
-        return MOCK_RESPONSE
+        return mock_response
     
-    monkeypatch.setattr("requests.get", mock_get)
-    return mock_get
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("requests.Session.get", mock_get)
+        yield mock_get
 
 
 @pytest.fixture
 def temp_dir(tmp_path):
     """Create a temporary directory for testing file operations"""
-    # Create the api directory structure with nested folders
-    (tmp_path / "api").mkdir()
-    (tmp_path / "api" / "2021").mkdir()
-    (tmp_path / "api" / "2021" / "01").mkdir()
-    
-    # Return the temporary path
+    # Create the api directory structure with nested folders in one call;
+    # kept per-test because the tests write into it
+    (tmp_path / "api" / "2021" / "01").mkdir(parents=True)
     return tmp_path
 
 
 class TestEuriborDataFetching:
     """Tests for data fetching and API interaction"""
 
-    def test_api_request_structure(self, mock_requests_get):
+    def test_api_request_structure(self, mock_response):
         """Test the structure of API requests"""
-        with mock.patch('requests.get') as mock_get:
-            mock_get.return_value = MOCK_RESPONSE
+        with mock.patch('requests.Session.get') as mock_get:
+            mock_get.return_value = mock_response
             send_request_per_day(2021, 1)
             
             # Verify the mock was called with the correct URL
@@ -100,31 +165,145 @@ class TestEuriborDataFetching:
             assert kwargs['url'] == "https://www.euribor-rates.eu/umbraco/api/euriborpageapi/highchartsdata"
             
             # Verify headers and parameters (adjust as needed)
-            assert "Referer" in kwargs['headers']
+            assert "Referer" in euribor._session.headers
             assert "series[0]" in kwargs['params']
 
+    def test_conditional_request(self):
+        """Test that cached responses are revalidated and reused on 304"""
+        fresh_response = mock.Mock(status_code=200, headers={"ETag": '"v1"'})
+        fresh_response.content = json.dumps(SAMPLE_API_RESPONSE).encode()
+        not_modified_response = mock.Mock(status_code=304, headers={})
+        
+        # Fetched right after the range ends, so its rates are not settled yet
+        datetime_stub = frozen_datetime(datetime(2021, 2, 2, 12, 0, 0))
+        with mock.patch('requests.Session.get', side_effect=[fresh_response, not_modified_response]) as mock_get, \
+             mock.patch('src.euribor.datetime', datetime_stub):
+            assert euribor.fetch_euribor_data("2021-01-01", "2021-02-01") == SAMPLE_API_RESPONSE
+            
+            datetime_stub.frozen = datetime(2021, 2, 9, 12, 0, 0)
+            assert euribor.fetch_euribor_data("2021-01-01", "2021-02-01") == SAMPLE_API_RESPONSE
+            
+            # The second request must carry the validator from the first one
+            assert mock_get.call_args_list[0].kwargs['headers'] == {}
+            assert mock_get.call_args_list[1].kwargs['headers'] == {"If-None-Match": '"v1"'}
+            
+            # The 304 confirmed the cached data, which is now settled and not requested again
+            assert euribor.fetch_euribor_data("2021-01-01", "2021-02-01") == SAMPLE_API_RESPONSE
+            assert mock_get.call_count == 2
+
+    def test_settled_range_served_from_cache(self, mock_response):
+        """Test that a range fetched well after it ended is not requested again"""
+        with mock.patch('requests.Session.get', return_value=mock_response) as mock_get:
+            assert euribor.fetch_euribor_data("2021-01-01", "2021-02-01") == SAMPLE_API_RESPONSE
+            assert euribor.fetch_euribor_data("2021-01-01", "2021-02-01") == SAMPLE_API_RESPONSE
+        
+        mock_get.assert_called_once()
+    
+    def test_settled_range_revalidated_after_expiry(self, mock_response):
+        """Test that a settled range is requested again once its cache entry expires"""
+        datetime_stub = frozen_datetime(datetime(2021, 3, 1, 12, 0, 0))
+        with mock.patch('requests.Session.get', return_value=mock_response) as mock_get, \
+             mock.patch('src.euribor.datetime', datetime_stub):
+            euribor.fetch_euribor_data("2021-01-01", "2021-02-01")
+        
+            # Still fresh a few days later
+            datetime_stub.frozen = datetime(2021, 3, 10, 12, 0, 0)
+            euribor.fetch_euribor_data("2021-01-01", "2021-02-01")
+            assert mock_get.call_count == 1
+        
+            datetime_stub.frozen = datetime(2021, 4, 15, 12, 0, 0)
+            euribor.fetch_euribor_data("2021-01-01", "2021-02-01")
+            assert mock_get.call_count == 2
+    
+    def test_current_month_cached_in_one_file(self):
+        """Test that the current month up to today replaces its cache entry instead of adding a file per day"""
+        fresh_response = mock.Mock(status_code=200, headers={"ETag": '"v1"'})
+        fresh_response.content = json.dumps(SAMPLE_API_RESPONSE).encode()
+        
+        datetime_stub = frozen_datetime(datetime(2021, 2, 10, 12, 0, 0))
+        with mock.patch('requests.Session.get', return_value=fresh_response) as mock_get, \
+             mock.patch('src.euribor.datetime', datetime_stub):
+            euribor.fetch_euribor_data("2021-02-01", "2021-02-10")
+        
+            datetime_stub.frozen = datetime(2021, 2, 11, 12, 0, 0)
+            euribor.fetch_euribor_data("2021-02-01", "2021-02-11")
+        
+        # The entry for an earlier day is not used to validate the longer range
+        assert mock_get.call_args_list[1].kwargs['headers'] == {}
+        assert os.listdir(euribor.HTTP_CACHE_DIR) == ["2021-02-01_current.json"]
+    
+    def test_fetch_many_preserves_order(self):
+        """Test that concurrent fetches return results in the requested order"""
+        date_ranges = [(f"{year}-01-01", f"{year+1}-01-01") for year in range(2010, 2022)]
+        with mock.patch('src.euribor.fetch_euribor_data', side_effect=lambda start, end: start):
+            results = fetch_euribor_data_many(date_ranges)
+        
+        assert results == [start for start, _ in date_ranges]
+    
+    def test_fetch_many_retries_failed_ranges(self):
+        """Test that a range that failed is requested again at the end"""
+        date_ranges = [("2021-01-01", "2022-01-01"), ("2022-01-01", "2023-01-01")]
+        with mock.patch('src.euribor.fetch_euribor_data', side_effect=[SAMPLE_API_RESPONSE, None, SAMPLE_API_RESPONSE]) as mock_fetch:
+            # A single worker keeps the order of the calls deterministic
+            results = fetch_euribor_data_many(date_ranges, max_workers=1)
+        
+        assert mock_fetch.call_count == 3
+        assert mock_fetch.call_args_list[-1].args == date_ranges[1]
+        assert results == [SAMPLE_API_RESPONSE, SAMPLE_API_RESPONSE]
+    
+    def test_fetch_many_runs_concurrently(self):
+        """Test that the ranges are requested at the same time, not one after another"""
+        date_ranges = [("2020-01-01", "2021-01-01"), ("2021-01-01", "2022-01-01")]
+        # Each fetch waits for the other one, which only returns if both are in flight
+        barrier = threading.Barrier(len(date_ranges), timeout=5)
+        
+        def fetch(start, end):
+            barrier.wait()
+            return start
+        
+        with mock.patch('src.euribor.fetch_euribor_data', side_effect=fetch):
+            results = fetch_euribor_data_many(date_ranges)
+        
+        assert results == ["2020-01-01", "2021-01-01"]
+    
+    def test_session_reused_across_requests(self, mock_response):
+        """Test that every request goes through the shared session"""
+        with mock.patch.object(euribor._session, 'get', return_value=mock_response) as mock_get, \
+             mock.patch('requests.Session') as mock_session_class, \
+             mock.patch('requests.get') as mock_plain_get:
+            send_request_per_day(2021, 1)
+            send_request_per_day(2021, 2)
+            send_request_per_month(2021)
+        
+        assert mock_get.call_count == 3
+        mock_session_class.assert_not_called()
+        mock_plain_get.assert_not_called()
+
 
 class TestEuriborFileOperations:
     """Tests for file operations"""
 
-    @mock.patch('os.makedirs')
-    def test_directory_creation(self, mock_makedirs, mock_requests_get):
+    def test_directory_creation(self, mock_requests_get):
         """Test that directories are created if they don't exist"""
+        # Test for directory creation for yearly JSON
+        send_request_per_month(2021)
+        assert os.path.isdir(YEAR_2021_DIR)
+        
         # Test for directory creation in send_request_per_day (creates monthly JSON dirs)
-        with mock.patch('builtins.open', mock.mock_open()), \
-             mock.patch('json.load', return_value={}), \
-             mock.patch('json.dump'):
-            send_request_per_day(2021, 1)
-            # Check that year/month directory for JSON is created
-            mock_makedirs.assert_any_call(os.path.join('api', '2021', '01'), exist_ok=True)
+        send_request_per_day(2021, 1)
+        assert os.path.isdir(JANUARY_2021_DIR)
+
+    def test_directory_created_once(self, monkeypatch):
+        """Test that each directory is only created once per run"""
+        created = []
+        monkeypatch.setattr('os.makedirs', lambda path, exist_ok=False: created.append((path, exist_ok)))
         
-        # Test for directory creation for yearly JSON
-        with mock.patch('builtins.open', mock.mock_open()), \
-             mock.patch('json.load', return_value={}), \
-             mock.patch('json.dump'):
-            send_request_per_month(2021)
-            # Check that year directory is created
-            mock_makedirs.assert_any_call(os.path.join('api', '2021'), exist_ok=True)
+        euribor.ensure_dir(JANUARY_2021_DIR)
+        euribor.ensure_dir(JANUARY_2021_DIR)
+        # The parent was created along with the month directory
+        euribor.ensure_dir(YEAR_2021_DIR)
+        
+        assert created == [(JANUARY_2021_DIR, True)]
 
     def test_process_daily_data(self, mock_requests_get):
         """Test processing daily data from API response"""
@@ -139,181 +318,246 @@ class TestEuriborFileOperations:
             # Check that the generate_monthly_json function was called
             mock_generate_json.assert_called()
 
+    def test_process_daily_data_from_yearly_data(self):
+        """Test that daily data is sliced out of a longer pre-fetched range"""
+        yearly_data = [{"Data": SAMPLE_API_RESPONSE[0]["Data"] + [[1612137600000, 0.2]]}]  # + 2021-02-01
+        with mock.patch('src.euribor.fetch_euribor_data') as mock_fetch, \
+             mock.patch('src.euribor.generate_monthly_json'):
+            january = send_request_per_day(2021, 1, yearly_data)
+            february = send_request_per_day(2021, 2, yearly_data)
+            mock_fetch.assert_not_called()
+        
+        assert january["daily_data"] == {"01": 0.123, "02": 0.145, "03": 0.167, "04": 0.189}
+        assert february["daily_data"] == {"01": 0.2}
+    
+    def test_process_daily_data_month_bounds(self):
+        """Test that the first and last millisecond of a month belong to it"""
+        data = [{"Data": [
+            [1609459199999, 0.1],  # 2020-12-31 23:59:59.999
+            [1609459200000, 0.2],  # 2021-01-01 00:00:00
+            [1612137599999, 0.3],  # 2021-01-31 23:59:59.999
+            [1612137600000, 0.4],  # 2021-02-01 00:00:00
+        ]}]
+        
+        result = euribor.process_daily_data("2021", "01", data)
+        assert result == {"days_processed": 2, "daily_data": {"01": 0.2, "31": 0.3}}
+
+    def test_split_data_by_month(self):
+        """Test grouping API data points by month"""
+        yearly_data = [{"Data": SAMPLE_API_RESPONSE[0]["Data"] + [[1612137600000, 0.2]]}]  # + 2021-02-01
+        
+        assert euribor.split_data_by_month(yearly_data) == {
+            "2021-01": SAMPLE_API_RESPONSE,
+            "2021-02": [{"Data": [[1612137600000, 0.2]]}],
+        }
+    
+    def test_monthly_average_exact_sum(self):
+        """Test that the average is rounded from an exact sum of the values"""
+        # A plain float sum of these values rounds to 4.295, the exact mean is 4.2955
+        data = [{"Data": [[1609459200000, 4.304], [1609545600000, 4.301], [1609632000000, 4.261], [1609718400000, 4.316]]}]
+        assert euribor.calculate_monthly_averages(data) == {"2021-01": 4.296}
+    
+    def test_select_months_data(self):
+        """Test picking the data of some months out of a year's data"""
+        assert euribor.select_months_data(2021, [1, 3], SAMPLE_API_RESPONSE) == [SAMPLE_API_RESPONSE, []]
+        # Without yearly data each month has to be fetched on its own
+        assert euribor.select_months_data(2021, [1, 3], None) == [None, None]
+
     def test_process_monthly_data(self, mock_requests_get):
         """Test processing monthly data from API response"""
-        with mock.patch('src.euribor.update_yearly_json') as mock_generate_json:
+        with mock.patch('src.euribor.update_yearly_months', return_value=1) as mock_generate_json:
             result = send_request_per_month(2021)
             
             # Check the result structure
             assert "months_processed" in result
             assert "monthly_averages" in result
             assert result["months_processed"] > 0
+            assert result["monthly_averages"] == {"2021-01": 0.156}
             
-            # Check that the update_yearly_json function was called
-            mock_generate_json.assert_called()
+            # Check that the yearly JSON file is updated once with all its months
+            mock_generate_json.assert_called_once_with("2021", {"01": 0.156}, mock.ANY)
     
     def test_json_generation(self, temp_dir):
         """Test JSON file generation with metadata"""
-        # Change to the temp directory for file operations
-        original_dir = os.getcwd()
-        os.chdir(temp_dir)
-        try:
-            # Create test directories
-            os.makedirs(os.path.join('api', '2021'), exist_ok=True)
+        # Freeze datetime.now() in the module being tested
+        datetime_stub = frozen_datetime(END_OF_2021)
+        
+        with mock.patch('src.euribor.datetime', datetime_stub):
+            # Test generating a new JSON file
+            update_yearly_json('2021', '01', 3.456)
+            
+            # Verify the JSON file was created with the right content
+            json_file = YEAR_2021_JSON
+            data = load_json(json_file)
+            assert '01' in data
+            assert data['01']['value'] == '3.456'
+            assert data['01']['_meta']['full_date'] == '2021-01'
+            assert data['01']['_meta']['last_modified'] == '2021-12-31T12:00:00'
             
-            # Mock datetime.now() properly to return our fixed datetime
-            fixed_datetime = datetime(2021, 12, 31, 12, 0, 0)
-            datetime_mock = mock.Mock(wraps=datetime)
-            datetime_mock.now.return_value = fixed_datetime
+            # Test updating the same month with the same value
+            # The last_modified date should not change and the file is not rewritten
+            with mock.patch('src.euribor.write_json_file') as mock_write:
+                assert update_yearly_json('2021', '01', 3.456) is False
+                mock_write.assert_not_called()
             
-            # Patch the datetime class in the module being tested
-            with mock.patch('src.euribor.datetime', datetime_mock):
-                # Test generating a new JSON file
-                update_yearly_json('2021', '01', 3.456)
-                
-                # Verify the JSON file was created with the right content
-                json_file = os.path.join('api', '2021', 'index.json')
-                assert os.path.exists(json_file)
-                
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                    assert '01' in data
-                    assert data['01']['value'] == '3.456'
-                    assert data['01']['_meta']['full_date'] == '2021-01'
-                    assert data['01']['_meta']['last_modified'] == '2021-12-31T12:00:00'
-                
-                # Test updating the same month with the same value
-                # The last_modified date should not change
-                update_yearly_json('2021', '01', 3.456)
-                
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                    assert data['01']['_meta']['last_modified'] == '2021-12-31T12:00:00'
-                
-                # Test updating the same month with a different value
-                # The last_modified date should change
-                datetime_mock.now.return_value = datetime(2022, 1, 1, 12, 0, 0)
-                update_yearly_json('2021', '01', 3.789)
-                
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                    assert data['01']['value'] == '3.789'
-                    assert data['01']['_meta']['last_modified'] == '2022-01-01T12:00:00'
-        finally:
-            # Restore original directory
-            os.chdir(original_dir)
+            # Test updating the same month with a different value
+            # The last_modified date should change
+            datetime_stub.frozen = datetime(2022, 1, 1, 12, 0, 0)
+            update_yearly_json('2021', '01', 3.789)
+            
+            data = load_json(json_file)
+            assert data['01']['value'] == '3.789'
+            assert data['01']['_meta']['last_modified'] == '2022-01-01T12:00:00'
+    
+    def test_write_json_file_skips_identical_content(self, tmp_path):
+        """Test that a JSON file is not rewritten when its content is unchanged"""
+        json_file = str(tmp_path / "index.json")
+        data = {"01": {"value": "3.456"}}
+        
+        assert euribor.write_json_file(json_file, data) is True
+        os.utime(json_file, (0, 0))
+        
+        assert euribor.write_json_file(json_file, data) is False
+        assert os.stat(json_file).st_mtime == 0
+        
+        assert euribor.write_json_file(json_file, {"01": {"value": "3.789"}}) is True
+        assert os.stat(json_file).st_mtime > 0
+        assert os.listdir(tmp_path) == ["index.json"]
+    
+    def test_single_write_per_json_file(self):
+        """Test that a generated JSON file is written with a single call"""
+        mock_file = mock.mock_open()
+        with mock.patch('builtins.open', mock_file), mock.patch('os.replace'):
+            generate_monthly_json('2021', '01', {'04': 0.189}, AFTER_JANUARY_2021)
+        
+        mock_file().write.assert_called_once()
+        assert json.loads(mock_file().write.call_args.args[0])['04']['value'] == '0.189'
+    
+    def test_print_daily_json_changes(self, capsys):
+        """Test that the daily file changes of a year are reported together"""
+        results = [{"json_status": "Updated"}, {"json_status": None}, {"json_status": "Updated"}, {"json_status": "Created"}]
+        euribor.print_daily_json_changes(2021, [1, 2, 3, 4], results)
+        
+        assert capsys.readouterr().out.splitlines() == [
+            "Updated daily JSON data for 2021/01, 2021/03",
+            "Created daily JSON data for 2021/04",
+        ]
+    
+    def test_generate_all_monthly_json_reports_by_year(self, capsys):
+        """Test that the bulk generation reports the daily file changes once per year, with one run time"""
+        result = {"days_processed": 1, "json_status": "Updated"}
+        with mock.patch('src.euribor.fetch_euribor_data_many', return_value=[SAMPLE_API_RESPONSE, SAMPLE_API_RESPONSE]), \
+             mock.patch('src.euribor.send_request_per_day', return_value=result) as mock_send:
+            generate_all_monthly_json({2021: [2, 1], 2020: [12]}, END_OF_2021)
+        
+        assert [line for line in capsys.readouterr().out.splitlines() if line.startswith("Updated")] == [
+            "Updated daily JSON data for 2020/12",
+            "Updated daily JSON data for 2021/01, 2021/02",
+        ]
+        assert [call.args[3] for call in mock_send.call_args_list] == [END_OF_2021] * 3
+    
+    def test_run_timestamp_threaded_through(self):
+        """Test that a timestamp given for the run is used as last_modified"""
+        update_yearly_json('2021', '01', 3.456, "2021-12-31T12:00:00")
+        generate_monthly_json('2021', '01', {'04': 0.189}, END_OF_2021)
+        
+        assert load_json(YEAR_2021_JSON)['01']['_meta']['last_modified'] == "2021-12-31T12:00:00"
+        assert load_json(JANUARY_2021_JSON)['04']['_meta']['last_modified'] == "2021-12-31T12:00:00"
+    
+    def test_yearly_file_read_once(self):
+        """Test that a yearly JSON file is parsed once and then reused"""
+        with mock.patch('src.euribor.read_json_file', wraps=euribor.read_json_file) as mock_read:
+            update_yearly_json('2021', '01', 3.456)
+            update_yearly_json('2021', '02', 3.789)
+            data = create_yearly_json(2021)
+        
+        mock_read.assert_called_once()
+        assert list(data) == ["01", "02"]
+        assert load_json(YEAR_2021_JSON) == data
+    
+    def test_create_yearly_json_skips_updated_year(self):
+        """Test that a year updated during the run is not formatted again"""
+        update_yearly_json('2021', '01', 3.456)
+        
+        with mock.patch('src.euribor.write_json_file') as mock_write:
+            data = create_yearly_json(2021)
+        
+        mock_write.assert_not_called()
+        assert data["01"]["value"] == "3.456"
     
     def test_monthly_json_generation(self, temp_dir):
         """Test monthly JSON file generation with daily data"""
-        # Change to the temp directory for file operations
-        original_dir = os.getcwd()
-        os.chdir(temp_dir)
-        try:
-            # Create test directories
-            os.makedirs(os.path.join('api', '2021', '01'), exist_ok=True)
+        # Prepare test data
+        daily_data = {
+            '01': 0.123,  # 2021-01-01
+            '02': 0.145,  # 2021-01-02
+            '03': 0.167,  # 2021-01-03
+            '04': 0.189,  # 2021-01-04
+        }
+        
+        # Freeze datetime.now() on a date after the month being tested
+        # (to ensure no days are filtered out as future dates)
+        datetime_stub = frozen_datetime(AFTER_JANUARY_2021)
+        
+        with mock.patch('src.euribor.datetime', datetime_stub):
+            
+            # Test generating a new monthly JSON file
+            assert generate_monthly_json('2021', '01', daily_data) == "Created"
             
-            # Prepare test data
-            daily_data = {
-                '01': 0.123,  # 2021-01-01
-                '02': 0.145,  # 2021-01-02
-                '03': 0.167,  # 2021-01-03
-                '04': 0.189,  # 2021-01-04
-            }
+            # Verify the JSON file was created with the right content
+            json_file = JANUARY_2021_JSON
+            # All 31 days of January, in order, with null values for the days without data
+            data = load_json(json_file)
+            assert data == EXPECTED_JANUARY_2021
+            assert tuple(data) == JANUARY_DAYS
             
-            # Mock datetime.now() to return a fixed date after the month being tested
-            # (to ensure no days are filtered out as future dates)
-            fixed_datetime = datetime(2021, 2, 1, 12, 0, 0)  # February 1st, after the month we're testing
+            # Test future date filtering - set now to be in the middle of the month
+            datetime_stub.frozen = datetime(2021, 1, 2, 12, 0, 0)  # January 2nd, within the month
             
-            with mock.patch('src.euribor.datetime', mock.Mock(wraps=datetime)) as mock_dt:
-                mock_dt.now.return_value = fixed_datetime
-                
-                # Test generating a new monthly JSON file
-                generate_monthly_json('2021', '01', daily_data)
-                
-                # Verify the JSON file was created with the right content
-                json_file = os.path.join('api', '2021', '01', 'index.json')
-                assert os.path.exists(json_file)
-                
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                    # Check that we have 31 days (January has 31 days)
-                    assert len(data) == 31
-                    
-                    # Check our specific days have the correct values
-                    assert '01' in data
-                    assert '02' in data
-                    assert '03' in data
-                    assert '04' in data
-                    
-                    # Verify data values
-                    assert data['01']['value'] == '0.123'
-                    assert data['02']['value'] == '0.145'
-                    assert data['03']['value'] == '0.167'
-                    assert data['04']['value'] == '0.189'
-                    
-                    # Check that other days have null values
-                    assert data['05']['value'] is None
-                    assert data['15']['value'] is None
-                    assert data['31']['value'] is None
-                    
-                    # Verify metadata for a specific day
-                    assert data['01']['_meta']['full_date'] == '2021-01-01'
-                    assert data['01']['_meta']['last_modified'] == '2021-02-01T12:00:00'
-                
-                # Test future date filtering - set now to be in the middle of the month
-                mock_dt.now.return_value = datetime(2021, 1, 2, 12, 0, 0)  # January 2nd, within the month
-                
-                # Update data with different values
-                daily_data['03'] = 0.172  # Changed value
-                daily_data['05'] = 0.210  # Future day that should be filtered
-                
-                generate_monthly_json('2021', '01', daily_data)
-                
-                # Verify the JSON file was updated correctly
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                    # Should only have days up to the current date (01 and 02)
-                    assert len(data) == 2
-                    assert '01' in data
-                    assert '02' in data
-                    assert '03' not in data  # Future day
-                    assert '04' not in data  # Future day
-                    assert '05' not in data  # Future day
-                    
-                    # Values should be correct
-                    assert data['01']['value'] == '0.123'
-                    assert data['02']['value'] == '0.145'
-        
-        finally:
-            # Change back to the original directory
-            os.chdir(original_dir)
+            # Update data with different values
+            daily_data['03'] = 0.172  # Changed value
+            daily_data['05'] = 0.210  # Future day that should be filtered
+            
+            assert generate_monthly_json('2021', '01', daily_data) == "Updated"
+            
+            # Verify the JSON file was updated correctly
+            data = load_json(json_file)
+            # Should only have days up to the current date (01 and 02), future days are dropped,
+            # and the unchanged days keep their values and metadata
+            assert data == {day: EXPECTED_JANUARY_2021[day] for day in JANUARY_DAYS[:2]}
+            assert tuple(data) == JANUARY_DAYS[:2]
+
 
 class TestEuriborIntegration:
     """Integration tests for the entire workflow"""
 
     def test_full_workflow(self, mock_requests_get):
         """Test that the full workflow executes without errors"""
-        # Mock any file operations to avoid actual file changes
-        with mock.patch('os.makedirs'):
-            # Create a mock that can handle both read and write operations
-            mock_file = mock.mock_open(read_data='1.234')
-            
-            # Mock open to handle both writes and reads
-            with mock.patch('builtins.open', mock_file):
-                # Mock JSON load to return a proper structure
-                with mock.patch('json.load', return_value={}):
-                    with mock.patch('os.path.exists', return_value=True):
-                        with mock.patch('json.dump'):
-                            # Test if these functions run without errors
-                            send_request_per_day(2021, 1)
-                            send_request_per_month(2021)
-                            
-                            # Test the JSON generation functions with mocks in place
-                            # to verify they run without errors
-                            with mock.patch('src.euribor.send_request_per_month', return_value={"months_processed": 1, "monthly_averages": {"2021-01": 1.234}}):
-                                with mock.patch('src.euribor.send_request_per_day', return_value={"days_processed": 1, "daily_data": {"2021": {"01": {"01": 1.234}}}}):
-                                    generate_all_yearly_json()
-                                    generate_all_monthly_json()
+        # Files are written to the test's own working directory
+        send_request_per_day(2021, 1)
+        send_request_per_month(2021)
+        
+        # Test the JSON generation functions with mocks in place
+        # to verify they run without errors
+        with mock.patch('src.euribor.send_request_per_month', return_value={"months_processed": 1, "monthly_averages": {"2021-01": 1.234}}), \
+             mock.patch('src.euribor.send_request_per_day', return_value={"days_processed": 1, "daily_data": {"2021": {"01": {"01": 1.234}}}}):
+            generate_all_yearly_json()
+            generate_all_monthly_json()
+        
+        assert '01' in load_json(YEAR_2021_JSON)
+        assert '01' in load_json(JANUARY_2021_JSON)
+    
+    def test_main_with_failed_year(self):
+        """Test that a year that could not be fetched fails the run without losing the other years"""
+        with mock.patch('src.euribor.parse_args', return_value=(None, {2020: [1], 2021: [1]})), \
+             mock.patch('src.euribor.fetch_euribor_data_many', return_value=[None, SAMPLE_API_RESPONSE]):
+            with pytest.raises(SystemExit) as excinfo:
+                euribor.main()
+        
+        assert excinfo.value.code == 1
+        assert load_json(YEAR_2021_JSON)['01']['value'] == '0.156'
+        assert load_json(JANUARY_2021_JSON)['04']['value'] == '0.189'
+        assert not os.path.exists(os.path.join('api', '2020'))
 
 
 if __name__ == "__main__":